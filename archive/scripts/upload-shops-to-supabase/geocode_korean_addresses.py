@@ -3,37 +3,243 @@
 Geocode Korean addresses using Kakao Maps API
 """
 
+import argparse
+import asyncio
+import contextlib
 import csv
-import requests
-import time
 import os
+import re
+import sqlite3
+import time
 from typing import Dict, Optional, Tuple
 
+import aiohttp
+from tqdm import tqdm
+
 # Get API key from environment variable
 KAKAO_API_KEY = os.getenv('KAKAO_API_KEY', '')
 
-def geocode_address_kakao(address: str) -> Optional[Tuple[float, float]]:
+# Maximum number of geocoding requests in flight at once
+DEFAULT_CONCURRENCY = 32
+
+# Kakao Local API allows roughly 10 requests per second per key
+DEFAULT_RATE_LIMIT = 10.0
+
+# Slowest rate the rate-limit headers can push the limiter down to
+MIN_RATE_LIMIT = 0.1
+
+# X-RateLimit-Reset values above this are epoch timestamps, below it delays in seconds
+_EPOCH_THRESHOLD = 1e9
+
+# Retries on throttling / transient server errors before giving up on an address
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF_FACTOR = 0.3
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# Read/write the CSVs in 1 MiB blocks instead of the default 8 KiB
+IO_BUFFER_SIZE = 1024 * 1024
+
+# Rows read ahead of the CSV writer; bounds memory use for large inputs
+ROW_QUEUE_SIZE = 1024
+
+# On-disk cache of successful lookups, keyed by normalize_address()
+CACHE_FILE = 'geocode_cache.db'
+CACHE_COMMIT_INTERVAL = 100
+
+# Everything after the lot / building number (floor, building name, '번지')
+# does not change the geocoded point
+_ADDRESS_DETAIL_RE = re.compile(r'(?<=\s)(\d+(?:-\d+)?)(?:번지)?(?:\s.*)?$')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Keep-alive session shared by every geocoding call, see geocoder_session()
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+class MissingAPIKeyError(ValueError):
+    """The selected geocoding provider's API key is not set"""
+
+class TokenBucket:
+    """
+    Async token bucket shared by all geocoding tasks
+
+    Allows bursts of up to `capacity` requests (at least one) and refills at
+    `rate` tokens per second, only sleeping when the bucket is empty. The rate
+    follows the API's X-RateLimit-* response headers when they are sent,
+    clamped between MIN_RATE_LIMIT and the configured rate.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.max_rate = rate
+        # A bucket that can't hold a whole token would never let a request through
+        self.capacity = max(1.0, capacity or rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def update_from_headers(self, headers):
+        """Adapt the refill rate to X-RateLimit-Remaining / X-RateLimit-Reset"""
+        try:
+            remaining = float(headers['X-RateLimit-Remaining'])
+            reset = float(headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+
+        # Reset is either an epoch timestamp or a number of seconds from now;
+        # an epoch that has already passed (clock skew) carries no information
+        window = reset - time.time() if reset > _EPOCH_THRESHOLD else reset
+        if window <= 0:
+            return
+
+        self._refill()
+        self._tokens = min(self._tokens, remaining)
+        self.rate = min(self.max_rate, max(MIN_RATE_LIMIT, max(remaining, 1) / window))
+
+def normalize_address(address: str) -> str:
+    """
+    Normalize an address into a cache key
+
+    Examples:
+        '서울특별시 강남구 신사동 660-6번지 ' -> '서울특별시 강남구 신사동 660-6'
+        '서울특별시 서초구 잠원동 8-22 지하1층' -> '서울특별시 서초구 잠원동 8-22'
+    """
+    key = _WHITESPACE_RE.sub(' ', address.strip().strip('"').lower())
+    return _ADDRESS_DETAIL_RE.sub(r'\1', key)
+
+class GeocodeCache:
+    """
+    SQLite-backed cache of (latitude, longitude) keyed by provider and normalized address
+
+    Kakao and Google results are kept apart, so switching providers never
+    reuses the other provider's coordinates.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, provider: str = 'kakao'):
+        self._provider = provider
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(addr TEXT PRIMARY KEY, lat REAL, lon REAL, ts INTEGER)"
+        )
+        self._pending = 0
+
+    def _key(self, address: str) -> str:
+        return f"{self._provider}:{normalize_address(address)}"
+
+    def get(self, address: str) -> Optional[Tuple[float, float]]:
+        row = self._conn.execute(
+            "SELECT lat, lon FROM cache WHERE addr = ?", (self._key(address),)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put(self, address: str, coords: Tuple[float, float]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (addr, lat, lon, ts) VALUES (?, ?, ?, ?)",
+            (self._key(address), coords[0], coords[1], int(time.time()))
+        )
+        self._pending += 1
+        if self._pending >= CACHE_COMMIT_INTERVAL:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+def _get_session(concurrency: int = DEFAULT_CONCURRENCY) -> aiohttp.ClientSession:
+    """
+    Return the shared session, creating it (and its connection pool) on first use
+
+    The pool allows `concurrency` connections per host so it never caps the
+    semaphore in process_csv below the requested concurrency.
+    """
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        connector = aiohttp.TCPConnector(limit=max(64, concurrency), limit_per_host=concurrency,
+                                         keepalive_timeout=30, ttl_dns_cache=300)
+        _SESSION = aiohttp.ClientSession(connector=connector, timeout=REQUEST_TIMEOUT)
+    return _SESSION
+
+@contextlib.asynccontextmanager
+async def geocoder_session(concurrency: int = DEFAULT_CONCURRENCY):
+    """
+    Open the shared keep-alive session for the duration of a batch
+
+    Connections are reused across geocoding calls so only the first request
+    to each host pays for the TCP + TLS handshake. The pool is closed on exit.
+    """
+    session = _get_session(concurrency)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+def _retry_after_seconds(response: aiohttp.ClientResponse, default: float) -> float:
+    """Read the Retry-After header (in seconds), falling back to `default`"""
+    try:
+        return max(0.0, float(response.headers.get('Retry-After', '')))
+    except ValueError:
+        return default
+
+async def _get_json(bucket: TokenBucket, url: str, **kwargs) -> Dict:
+    """
+    GET a JSON document, backing off exponentially on throttling, 5xx errors,
+    dropped connections and timeouts
+    """
+    session = _get_session()
+    for attempt in range(MAX_RETRIES + 1):
+        backoff = RETRY_BACKOFF_FACTOR * (2 ** attempt)
+        await bucket.acquire()
+        try:
+            async with session.get(url, **kwargs) as response:
+                bucket.update_from_headers(response.headers)
+                if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                    await asyncio.sleep(_retry_after_seconds(response, backoff))
+                    continue
+                response.raise_for_status()
+                return await response.json()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            # e.g. the server closed an idle keep-alive connection
+            if attempt == MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff)
+
+    raise AssertionError("unreachable: the last attempt returns or raises")
+
+async def geocode_address_kakao(address: str, bucket: TokenBucket) -> Optional[Tuple[float, float]]:
     """
     Geocode a Korean address using Kakao Maps API
 
     Args:
         address: Korean address string
+        bucket: Rate limiter shared by all requests
 
     Returns:
         Tuple of (latitude, longitude) or None if geocoding fails
     """
     if not KAKAO_API_KEY:
-        raise ValueError("KAKAO_API_KEY environment variable not set")
+        raise MissingAPIKeyError("KAKAO_API_KEY environment variable not set")
 
     url = "https://dapi.kakao.com/v2/local/search/address.json"
     headers = {"Authorization": f"KakaoAK {KAKAO_API_KEY}"}
     params = {"query": address}
 
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-
-        data = response.json()
+        data = await _get_json(bucket, url, headers=headers, params=params)
 
         if data.get('documents') and len(data['documents']) > 0:
             # Get first result
@@ -45,19 +251,21 @@ def geocode_address_kakao(address: str) -> Optional[Tuple[float, float]]:
 
             return (lat, lon)
         else:
-            print(f"No results found for: {address}")
+            tqdm.write(f"No results found for: {address}")
             return None
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error geocoding {address}: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        # ValueError covers a response body that isn't valid JSON
+        tqdm.write(f"Error geocoding {address}: {e}")
         return None
 
-def geocode_address_google(address: str) -> Optional[Tuple[float, float]]:
+async def geocode_address_google(address: str, bucket: TokenBucket) -> Optional[Tuple[float, float]]:
     """
     Geocode address using Google Geocoding API (alternative method)
 
     Args:
         address: Address string
+        bucket: Rate limiter shared by all requests
 
     Returns:
         Tuple of (latitude, longitude) or None if geocoding fails
@@ -65,7 +273,7 @@ def geocode_address_google(address: str) -> Optional[Tuple[float, float]]:
     google_api_key = os.getenv('GOOGLE_MAPS_API_KEY', '')
 
     if not google_api_key:
-        raise ValueError("GOOGLE_MAPS_API_KEY environment variable not set")
+        raise MissingAPIKeyError("GOOGLE_MAPS_API_KEY environment variable not set")
 
     url = "https://maps.googleapis.com/maps/api/geocode/json"
     params = {
@@ -75,77 +283,190 @@ def geocode_address_google(address: str) -> Optional[Tuple[float, float]]:
     }
 
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-
-        data = response.json()
+        data = await _get_json(bucket, url, params=params)
 
         if data.get('status') == 'OK' and data.get('results'):
             location = data['results'][0]['geometry']['location']
             return (location['lat'], location['lng'])
         else:
-            print(f"Google API: {data.get('status')} for {address}")
+            tqdm.write(f"Google API: {data.get('status')} for {address}")
             return None
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error geocoding with Google {address}: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        # ValueError covers a response body that isn't valid JSON
+        tqdm.write(f"Error geocoding with Google {address}: {e}")
         return None
 
-def process_csv(input_file: str, output_file: str, use_google: bool = False):
+async def _process_csv_async(input_file: str, output_file: str, use_google: bool,
+                             concurrency: int, rate_limit: float,
+                             cache: Optional[GeocodeCache]) -> Tuple[int, int]:
     """
-    Process CSV file and add lat/lon columns
+    Geocode input_file into output_file as a producer / consumer pipeline
 
-    Args:
-        input_file: Path to input CSV file
-        output_file: Path to output CSV file
-        use_google: If True, use Google API instead of Kakao
+    The producer reads rows and starts one geocoding task per row, queueing
+    the tasks in input order. A single consumer awaits them in that order and
+    writes each row as soon as it is ready, so disk writes overlap with
+    network requests. The bounded queue keeps at most ROW_QUEUE_SIZE rows in
+    memory regardless of the CSV size.
+
+    Returns:
+        Tuple of (rows processed, rows geocoded)
     """
     geocode_func = geocode_address_google if use_google else geocode_address_kakao
-    api_name = "Google" if use_google else "Kakao"
+    sem = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate_limit)
+
+    # Rows sharing a normalized address share one lookup while it is in flight;
+    # once it finishes, later repeats are served by the cache
+    in_flight: Dict[str, asyncio.Future] = {}
+
+    async def lookup(address: str) -> Optional[Tuple[float, float]]:
+        if cache:
+            coords = cache.get(address)
+            if coords:
+                return coords
+
+        async with sem:
+            coords = await geocode_func(address, bucket)
+
+        if coords and cache:
+            cache.put(address, coords)
+        return coords
+
+    async def geocode_row(row: Dict) -> Optional[Tuple[float, float]]:
+        address = row.get('ADDRESS', '').strip()
+        if not address:
+            return None
 
-    print(f"Using {api_name} Maps API for geocoding...")
+        key = normalize_address(address)
+        future = in_flight.get(key)
+        if future is None:
+            future = in_flight[key] = asyncio.ensure_future(lookup(address))
+            future.add_done_callback(lambda _: in_flight.pop(key, None))
+        return await future
 
-    rows_processed = 0
-    rows_geocoded = 0
+    queue: asyncio.Queue = asyncio.Queue(maxsize=ROW_QUEUE_SIZE)
 
-    with open(input_file, 'r', encoding='utf-8') as infile, \
-         open(output_file, 'w', encoding='utf-8', newline='') as outfile:
+    with open(input_file, 'r', encoding='utf-8', buffering=IO_BUFFER_SIZE) as infile, \
+         open(output_file, 'w', encoding='utf-8', newline='',
+              buffering=IO_BUFFER_SIZE) as outfile, \
+         tqdm(unit='row', desc='Geocoding') as progress:
 
         reader = csv.DictReader(infile)
 
         # Add lat/lon columns to fieldnames
-        fieldnames = reader.fieldnames + ['LATITUDE', 'LONGITUDE']
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(outfile, fieldnames=list(reader.fieldnames or []) + ['LATITUDE', 'LONGITUDE'])
         writer.writeheader()
 
-        for row in reader:
-            rows_processed += 1
-            address = row.get('ADDRESS', '').strip()
-
-            if address:
-                print(f"\nProcessing {rows_processed}: {row.get('SHOP_NAME', 'Unknown')}")
-                print(f"Address: {address}")
-
-                coords = geocode_func(address)
+        async def produce():
+            for row in reader:
+                task = asyncio.ensure_future(geocode_row(row))
+                try:
+                    await queue.put((row, task))
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+            await queue.put(None)
+
+        async def consume() -> Tuple[int, int]:
+            rows_processed = 0
+            rows_geocoded = 0
+
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return rows_processed, rows_geocoded
+
+                row, task = item
+                coords = await task
+                rows_processed += 1
 
                 if coords:
-                    lat, lon = coords
-                    row['LATITUDE'] = lat
-                    row['LONGITUDE'] = lon
+                    row['LATITUDE'], row['LONGITUDE'] = coords
                     rows_geocoded += 1
-                    print(f"✓ Geocoded: {lat}, {lon}")
                 else:
+                    address = row.get('ADDRESS', '').strip()
+                    if address:
+                        # Only failures are reported per row; everything else is a progress tick
+                        tqdm.write(f"✗ Failed to geocode {row.get('SHOP_NAME', 'Unknown')} ({address})")
                     row['LATITUDE'] = ''
                     row['LONGITUDE'] = ''
-                    print(f"✗ Failed to geocode")
 
-                # Rate limiting - be respectful to the API
-                time.sleep(0.1)  # 100ms delay between requests
-            else:
-                row['LATITUDE'] = ''
-                row['LONGITUDE'] = ''
+                writer.writerow(row)
+                progress.update()
+
+        async with geocoder_session(concurrency):
+            producer = asyncio.ensure_future(produce())
+            try:
+                return await consume()
+            finally:
+                # If a lookup failed, cancel and reap every task still queued so
+                # their exceptions aren't left unretrieved
+                producer.cancel()
+                pending = [producer]
+                while not queue.empty():
+                    item = queue.get_nowait()
+                    if item is not None:
+                        item[1].cancel()
+                        pending.append(item[1])
+                await asyncio.gather(*pending, return_exceptions=True)
+
+def _check_api_key(use_google: bool):
+    """Raise MissingAPIKeyError before any work starts if the selected API key is missing"""
+    if use_google and not os.getenv('GOOGLE_MAPS_API_KEY', ''):
+        raise MissingAPIKeyError("GOOGLE_MAPS_API_KEY environment variable not set")
+    if not use_google and not KAKAO_API_KEY:
+        raise MissingAPIKeyError("KAKAO_API_KEY environment variable not set")
+
+def _positive_int(value: str) -> int:
+    """argparse type for --concurrency: a semaphore of zero would never let a request start"""
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return count
+
+def _positive_float(value: str) -> float:
+    """argparse type for --rps: a rate of zero or below would never refill the bucket"""
+    try:
+        rate = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value!r}")
+    if rate <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return rate
+
+def process_csv(input_file: str, output_file: str, use_google: bool = False,
+                concurrency: int = DEFAULT_CONCURRENCY, rate_limit: float = DEFAULT_RATE_LIMIT,
+                cache_file: Optional[str] = CACHE_FILE):
+    """
+    Process CSV file and add lat/lon columns
+
+    Args:
+        input_file: Path to input CSV file
+        output_file: Path to output CSV file
+        use_google: If True, use Google API instead of Kakao
+        concurrency: Maximum number of requests in flight at once
+        rate_limit: Maximum requests per second (and burst size) for the API key
+        cache_file: SQLite geocode cache path, or None to always query the API
+    """
+    _check_api_key(use_google)
+
+    api_name = "Google" if use_google else "Kakao"
 
-            writer.writerow(row)
+    print(f"Using {api_name} Maps API for geocoding ({concurrency} concurrent requests)...")
+
+    provider = 'google' if use_google else 'kakao'
+    cache = GeocodeCache(cache_file, provider) if cache_file else None
+    try:
+        rows_processed, rows_geocoded = asyncio.run(_process_csv_async(
+            input_file, output_file, use_google, concurrency, rate_limit, cache
+        ))
+    finally:
+        if cache:
+            cache.close()
 
     print(f"\n{'='*60}")
     print(f"Geocoding complete!")
@@ -158,19 +479,29 @@ def process_csv(input_file: str, output_file: str, use_google: bool = False):
 if __name__ == "__main__":
     import sys
 
+    parser = argparse.ArgumentParser(description="Geocode shop.csv addresses")
+    parser.add_argument('--google', action='store_true',
+                        help="Use Google Geocoding API instead of Kakao")
+    parser.add_argument('-n', '--concurrency', type=_positive_int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum concurrent requests (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--rps', type=_positive_float, default=DEFAULT_RATE_LIMIT,
+                        help=f"Maximum requests per second; rate-limit headers can only lower it (default: {DEFAULT_RATE_LIMIT:g})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f"Ignore the {CACHE_FILE} geocode cache")
+    args = parser.parse_args()
+
     input_csv = "shop.csv"
     output_csv = "shop_with_coordinates.csv"
 
-    # Check if using Google API
-    use_google = '--google' in sys.argv
-
     if not os.path.exists(input_csv):
         print(f"Error: {input_csv} not found!")
         sys.exit(1)
 
     try:
-        process_csv(input_csv, output_csv, use_google=use_google)
-    except ValueError as e:
+        process_csv(input_csv, output_csv, use_google=args.google,
+                    concurrency=args.concurrency, rate_limit=args.rps,
+                    cache_file=None if args.no_cache else CACHE_FILE)
+    except MissingAPIKeyError as e:
         print(f"\nError: {e}")
         print("\nTo use this script, you need to set an API key:")
         print("\nFor Kakao Maps API (Recommended for Korean addresses):")
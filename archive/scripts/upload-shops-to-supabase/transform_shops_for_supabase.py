@@ -2,13 +2,26 @@
 """
 Transform geocoded shop data to Supabase-compatible format
 Maps Korean beauty shop types to ServiceCategory enums
+
+Fully type-annotated so it can optionally be compiled with mypyc
+(pip install mypy):
+    mypyc --ignore-missing-imports transform_shops_for_supabase.py
+    python -c "import transform_shops_for_supabase as t; t.main()"
 """
 
-import csv
-import json
+import argparse
+import multiprocessing
+import multiprocessing.pool
+import os
+import re
 import uuid
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+import pandas as pd
+from tqdm import tqdm
 
 # Korean shop type to ServiceCategory enum mapping
 CATEGORY_MAPPING = {
@@ -20,17 +33,53 @@ CATEGORY_MAPPING = {
     '미용업': 'hair',  # Generic beauty -> hair
 }
 
+# CATEGORY_MAPPING flattened into parallel tuples, longest key first so
+# specific types win over the generic '미용업'
+_KEYS = tuple(sorted(CATEGORY_MAPPING, key=len, reverse=True))
+_VALS = tuple(CATEGORY_MAPPING[k] for k in _KEYS)
+
+# Single-pass partial matcher with one group per key; match.lastindex - 1
+# is the matched key's position in _KEYS / _VALS
+_CATEGORY_PATTERN = re.compile('|'.join(f'({re.escape(k)})' for k in _KEYS))
+
 # Valid enum values
 VALID_CATEGORIES = ['nail', 'eyelash', 'waxing', 'eyebrow_tattoo', 'hair']
 
-def clean_phone_number(phone: str) -> str:
+# Comma or Korean comma, along with the whitespace around it
+_TYPE_SPLIT_PATTERN = re.compile(r'\s*[，,]\s*')
+
+# Bounding box used to sanity-check coordinates are in the Seoul area
+SEOUL_LAT_RANGE = (37.4, 37.7)
+SEOUL_LON_RANGE = (126.8, 127.2)
+
+# Input is read in 1 MiB blocks and parsed in batches of CHUNK_ROWS rows
+IO_BUFFER_SIZE = 1024 * 1024
+CHUNK_ROWS = 10_000
+
+# Output file per --format; 'copy' is tab-separated text for PostgreSQL COPY
+OUTPUT_FILES = {
+    'json': 'shops_for_supabase.json',
+    'copy': 'shops_for_supabase.tsv',
+}
+
+# shops table columns in COPY order, same as the INSERT in insert_in_batches.ts
+COPY_COLUMNS = [
+    'id', 'name', 'address', 'phone_number', 'latitude', 'longitude', 'location',
+    'main_category', 'sub_categories', 'shop_type', 'shop_status', 'verification_status',
+    'commission_rate', 'total_bookings', 'is_featured', 'created_at', 'updated_at',
+]
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# Batches are transformed in parallel, at most WORKERS * 2 in flight at once
+WORKERS = os.cpu_count() or 1
+
+def clean_phone_numbers(phones: pd.Series) -> pd.Series:
     """Clean phone number format"""
     # Remove extra spaces
-    cleaned = ' '.join(phone.split())
+    cleaned = phones.str.replace(r'\s+', ' ', regex=True).str.strip()
     # Ensure it starts with proper format
-    if not cleaned.startswith('0'):
-        cleaned = f'0{cleaned}'
-    return cleaned
+    return cleaned.where(cleaned.str.startswith('0'), '0' + cleaned)
 
 def parse_shop_type(type_str: str) -> Tuple[str, Optional[List[str]]]:
     """
@@ -42,7 +91,7 @@ def parse_shop_type(type_str: str) -> Tuple[str, Optional[List[str]]]:
         '일반미용업, 네일미용업, 화장ㆍ분장 미용업' -> ('hair', ['nail', 'eyebrow_tattoo'])
     """
     # Split by comma or Korean comma
-    types = [t.strip() for t in type_str.replace('，', ',').split(',')]
+    types = _TYPE_SPLIT_PATTERN.split(type_str.strip())
 
     # Map all types to categories
     categories = []
@@ -51,24 +100,12 @@ def parse_shop_type(type_str: str) -> Tuple[str, Optional[List[str]]]:
         if t in CATEGORY_MAPPING:
             categories.append(CATEGORY_MAPPING[t])
         else:
-            # Try partial match
-            found = False
-            for korean_type, enum_val in CATEGORY_MAPPING.items():
-                if korean_type in t:
-                    categories.append(enum_val)
-                    found = True
-                    break
-            if not found:
-                # Default to hair for unknown types
-                categories.append('hair')
+            # Try partial match, defaulting to hair for unknown types
+            match = _CATEGORY_PATTERN.search(t)
+            categories.append(_VALS[match.lastindex - 1] if match and match.lastindex else 'hair')
 
     # Remove duplicates while preserving order
-    seen = set()
-    unique_categories = []
-    for cat in categories:
-        if cat not in seen:
-            seen.add(cat)
-            unique_categories.append(cat)
+    unique_categories = list(dict.fromkeys(categories))
 
     if not unique_categories:
         return ('hair', None)  # Default fallback
@@ -78,44 +115,57 @@ def parse_shop_type(type_str: str) -> Tuple[str, Optional[List[str]]]:
 
     return (main, sub)
 
-def transform_shop(row: Dict, index: int) -> Optional[Dict]:
-    """Transform a single shop row to Supabase format"""
+def generate_uuids(count: int) -> List[str]:
+    """Generate `count` random UUID4 strings from a single os.urandom() draw"""
+    raw = os.urandom(16 * count)
+    # version=4 sets the version and variant bits, same as uuid.uuid4()
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, len(raw), 16)]
 
-    # Skip if no coordinates
-    if not row.get('LATITUDE') or not row.get('LONGITUDE'):
-        print(f"⚠️  Skipping {row['SHOP_NAME']} - no coordinates")
-        return None
+def transform_shops(df: pd.DataFrame) -> Tuple[pd.DataFrame, int, List[str]]:
+    """
+    Transform a frame of geocoded shop rows to Supabase format
 
-    try:
-        lat = float(row['LATITUDE'])
-        lon = float(row['LONGITUDE'])
-    except (ValueError, TypeError):
-        print(f"⚠️  Skipping {row['SHOP_NAME']} - invalid coordinates")
-        return None
+    Returns:
+        Tuple of (shops frame indexed like `df`, number of skipped rows,
+        warning messages for skipped / out-of-bounds rows)
+    """
+    warnings: List[str] = []
 
-    # Validate coordinates are in Seoul area
-    if not (37.4 <= lat <= 37.7 and 126.8 <= lon <= 127.2):
-        print(f"⚠️  Warning: {row['SHOP_NAME']} coordinates outside Seoul bounds: {lat}, {lon}")
+    lat = pd.to_numeric(df['LATITUDE'], errors='coerce')
+    lon = pd.to_numeric(df['LONGITUDE'], errors='coerce')
 
-    # Parse categories
-    main_category, sub_categories = parse_shop_type(row['TYPE_OF_SHOP'])
+    # Skip rows without coordinates or with unparseable ones
+    missing = (df['LATITUDE'] == '') | (df['LONGITUDE'] == '')
+    invalid = ~missing & (lat.isna() | lon.isna())
+    for name in df.loc[missing, 'SHOP_NAME']:
+        warnings.append(f"⚠️  Skipping {name} - no coordinates")
+    for name in df.loc[invalid, 'SHOP_NAME']:
+        warnings.append(f"⚠️  Skipping {name} - invalid coordinates")
 
-    # Generate UUID
-    shop_id = str(uuid.uuid4())
+    keep = ~(missing | invalid)
+    df, lat, lon = df[keep], lat[keep], lon[keep]
+
+    # Validate coordinates are in Seoul area
+    outside = ~(lat.between(*SEOUL_LAT_RANGE) & lon.between(*SEOUL_LON_RANGE))
+    for name, la, lo in zip(df.loc[outside, 'SHOP_NAME'], lat[outside], lon[outside]):
+        warnings.append(f"⚠️  Warning: {name} coordinates outside Seoul bounds: {la}, {lo}")
+
+    # Only a handful of distinct type strings exist, so parse each once
+    type_col = df['TYPE_OF_SHOP']
+    parsed = type_col.map({t: parse_shop_type(t) for t in type_col.unique()})
 
     # Create timestamp
     now = datetime.utcnow().isoformat() + 'Z'
 
-    # Build shop object
-    shop = {
-        'id': shop_id,
-        'name': row['SHOP_NAME'].strip(),
-        'address': row['ADDRESS'].strip(),
-        'phone_number': clean_phone_number(row['PHONE_NUMBER']),
+    shops = pd.DataFrame({
+        'id': generate_uuids(len(df)),
+        'name': df['SHOP_NAME'].str.strip(),
+        'address': df['ADDRESS'].str.strip(),
+        'phone_number': clean_phone_numbers(df['PHONE_NUMBER']),
         'latitude': lat,
         'longitude': lon,
-        'main_category': main_category,
-        'sub_categories': sub_categories,
+        'main_category': parsed.map(lambda p: p[0]),
+        'sub_categories': parsed.map(lambda p: p[1]).astype(object),
         'shop_type': 'non_partnered',
         'shop_status': 'pending_approval',
         'verification_status': 'pending',
@@ -124,63 +174,141 @@ def transform_shop(row: Dict, index: int) -> Optional[Dict]:
         'is_featured': False,
         'created_at': now,
         'updated_at': now
-    }
+    }, index=df.index)
 
-    return shop
+    return shops, int((~keep).sum()), warnings
 
-def main():
-    input_file = 'shop_with_coordinates.csv'
-    output_file = 'shops_for_supabase.json'
+def imap_bounded(pool: multiprocessing.pool.Pool, func: Callable[[Any], Any],
+                 iterable: Iterable[Any], window: int) -> Iterator[Any]:
+    """
+    Like pool.imap, but keeps at most `window` tasks in flight
 
-    shops = []
-    skipped = 0
+    pool.imap drains its input eagerly, which would pull the whole CSV into
+    memory; this only reads ahead as results are consumed. Results are
+    yielded in input order.
+    """
+    pending: Deque[multiprocessing.pool.AsyncResult] = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def write_json_array(f: BinaryIO, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Stream records to a binary file as an indented JSON array
 
-    print("🔄 Transforming shop data for Supabase...")
-    print(f"📂 Reading from: {input_file}")
+    Only one record is serialized at a time; the output matches
+    orjson.dumps(list(records), option=orjson.OPT_INDENT_2).
+
+    Returns:
+        Number of records written
+    """
+    count = 0
+    for record in records:
+        f.write(b',\n  ' if count else b'[\n  ')
+        # orjson escapes newlines inside strings, so this only re-indents structure
+        f.write(orjson.dumps(record, option=orjson.OPT_INDENT_2).replace(b'\n', b'\n  '))
+        count += 1
+    f.write(b'\n]' if count else b'[]')
+    return count
+
+def _copy_value(value: Any) -> str:
+    """Format a single value for PostgreSQL COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join(value) + '}'
+    return str(value).translate(_COPY_ESCAPES)
+
+def write_copy_rows(f: BinaryIO, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Stream records to a binary file as PostgreSQL COPY text (tab-separated, NULL as \\N)
 
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    Columns follow COPY_COLUMNS; `location` is emitted as EWKT, which the
+    geography type accepts directly.
 
-        for idx, row in enumerate(reader, 1):
-            shop = transform_shop(row, idx)
-            if shop:
-                shops.append(shop)
-                if idx <= 5:  # Show first 5 for verification
-                    print(f"✓ {idx}. {shop['name'][:30]:30} -> {shop['main_category']:15} ({shop['latitude']:.4f}, {shop['longitude']:.4f})")
-            else:
-                skipped += 1
+    Returns:
+        Number of records written
+    """
+    count = 0
+    for record in records:
+        location = f"SRID=4326;POINT({record['longitude']} {record['latitude']})"
+        row = dict(record, location=location)
+        f.write(('\t'.join(_copy_value(row[c]) for c in COPY_COLUMNS) + '\n').encode('utf-8'))
+        count += 1
+    return count
+
+def main(output_format: str = 'json') -> None:
+    input_file = 'shop_with_coordinates.csv'
+    output_file = OUTPUT_FILES[output_format]
+    write_records = write_copy_rows if output_format == 'copy' else write_json_array
 
-    # Category distribution
-    category_counts = {}
-    for shop in shops:
-        cat = shop['main_category']
-        category_counts[cat] = category_counts.get(cat, 0) + 1
+    print("🔄 Transforming shop data for Supabase...")
+    print(f"📂 Reading from: {input_file}")
+
+    skipped = 0
+    category_counts: Dict[str, int] = {}
+    test_batch: List[Dict[str, Any]] = []  # First 10 shops
+
+    def transformed_shops() -> Iterator[Dict[str, Any]]:
+        nonlocal skipped
+        with open(input_file, 'r', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f, \
+             multiprocessing.Pool(WORKERS) as pool, \
+             tqdm(unit='row', desc='Transforming') as progress:
+            # Read everything as text so empty and malformed coordinates can be told apart
+            chunks = pd.read_csv(f, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS)
+
+            for chunk_shops, chunk_skipped, warnings in imap_bounded(pool, transform_shops, chunks, WORKERS * 2):
+                skipped += chunk_skipped
+                progress.update(len(chunk_shops) + chunk_skipped)
+                for warning in warnings:
+                    tqdm.write(warning)
+
+                # Show first 5 for verification
+                for idx, shop in chunk_shops[chunk_shops.index < 5].iterrows():
+                    tqdm.write(f"✓ {idx + 1}. {shop['name'][:30]:30} -> {shop['main_category']:15} ({shop['latitude']:.4f}, {shop['longitude']:.4f})")
+
+                # Category distribution
+                for cat, count in chunk_shops['main_category'].value_counts().items():
+                    category_counts[cat] = category_counts.get(cat, 0) + count
+
+                records = chunk_shops.to_dict(orient='records')
+                test_batch.extend(records[:10 - len(test_batch)])
+                yield from records
+
+    # Save one shop at a time
+    with open(output_file, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        transformed = write_records(f, transformed_shops())
 
     print(f"\n{'='*60}")
     print(f"📊 Transformation Summary:")
     print(f"{'='*60}")
-    print(f"Total shops processed: {len(shops) + skipped}")
-    print(f"Successfully transformed: {len(shops)}")
+    print(f"Total shops processed: {transformed + skipped}")
+    print(f"Successfully transformed: {transformed}")
     print(f"Skipped (no coordinates): {skipped}")
     print(f"\n📈 Category Distribution:")
     for cat, count in sorted(category_counts.items(), key=lambda x: -x[1]):
         print(f"  {cat:20} : {count:3} shops")
 
-    # Save to JSON
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(shops, f, ensure_ascii=False, indent=2)
-
     print(f"\n✅ Output saved to: {output_file}")
+    if output_format == 'copy':
+        print(f"   Load with: psql \"$DATABASE_URL\" -c \"\\COPY shops ({', '.join(COPY_COLUMNS)}) FROM '{output_file}'\"")
     print(f"{'='*60}\n")
 
     # Also create a small test batch
     test_batch_file = 'shops_test_batch.json'
-    test_batch = shops[:10]  # First 10 shops
-    with open(test_batch_file, 'w', encoding='utf-8') as f:
-        json.dump(test_batch, f, ensure_ascii=False, indent=2)
+    with open(test_batch_file, 'wb') as f:
+        f.write(orjson.dumps(test_batch, option=orjson.OPT_INDENT_2))
     print(f"📝 Test batch (10 shops) saved to: {test_batch_file}")
 
-    return shops
-
 if __name__ == '__main__':
-    shops = main()
+    parser = argparse.ArgumentParser(description="Transform shop_with_coordinates.csv for Supabase")
+    parser.add_argument('--format', choices=sorted(OUTPUT_FILES), default='json',
+                        help="json for the batch SQL generators, copy for psql \\COPY (default: json)")
+    args = parser.parse_args()
+
+    main(args.format)
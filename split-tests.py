@@ -26,36 +26,19 @@ categories = [
 header_end = content.find('async function runTests()')
 header = content[:header_end]
 
-# Create tests/admin directory
-os.makedirs('tests/admin', exist_ok=True)
-
-for category_name, start_marker, end_marker in categories:
-    print(f"Creating test file for {category_name}...")
-
-    # Find section boundaries
-    start_idx = content.find(start_marker)
-    if start_idx == -1:
-        print(f"  ⚠️  Start marker not found: {start_marker}")
-        continue
-
-    end_idx = content.find(end_marker, start_idx)
-    if end_idx == -1:
-        # For last category, find the final summary
-        end_idx = content.find('// Summary', start_idx)
-        if end_idx == -1:
-            end_idx = content.find('runTests()', start_idx)
-
-    # Extract section
-    section = content[start_idx:end_idx]
-
-    # Build the test file
-    test_file = f"""{header}
+# Everything except the title and the section is shared by all test files,
+# so build and encode it once up front
+HEADER_BYTES = f"""{header}
 async function runTests() {{
   console.log('===================================================================');
-  console.log('🧪 {category_name.upper()} Tests');
+""".encode('utf-8')
+
+TITLE_TEMPLATE = """  console.log('🧪 {} Tests');
   console.log('===================================================================\\n');
 
-{section}
+"""
+
+FOOTER_BYTES = """
 
   // ========================================
   // SUMMARY
@@ -63,32 +46,57 @@ async function runTests() {{
   console.log('\\n' + '='.repeat(70));
   console.log('📊 TEST SUMMARY');
   console.log('='.repeat(70));
-  console.log(`✅ Passed: ${{PASSED}}`);
-  console.log(`❌ Failed: ${{FAILED}}`);
-  console.log(`⏭️  Skipped: ${{SKIPPED}}`);
-  console.log(`📈 Total: ${{PASSED + FAILED + SKIPPED}}`);
+  console.log(`✅ Passed: ${PASSED}`);
+  console.log(`❌ Failed: ${FAILED}`);
+  console.log(`⏭️  Skipped: ${SKIPPED}`);
+  console.log(`📈 Total: ${PASSED + FAILED + SKIPPED}`);
   console.log('='.repeat(70));
 
-  if (FAILED > 0) {{
+  if (FAILED > 0) {
     console.log('\\n❌ Some tests failed. See details above.');
     process.exit(1);
-  }} else {{
+  } else {
     console.log('\\n✅ All tests passed!');
     process.exit(0);
-  }}
-}}
+  }
+}
 
 // Run tests
-runTests().catch((error) => {{
+runTests().catch((error) => {
   console.error('\\n💥 Test suite crashed:', error);
   process.exit(1);
-}});
-"""
+});
+""".encode('utf-8')
+
+# Create tests/admin directory
+os.makedirs('tests/admin', exist_ok=True)
+
+for category_name, start_marker, end_marker in categories:
+    print(f"Creating test file for {category_name}...")
+
+    # Find section boundaries
+    start_idx = content.find(start_marker)
+    if start_idx == -1:
+        print(f"  ⚠️  Start marker not found: {start_marker}")
+        continue
+
+    end_idx = content.find(end_marker, start_idx)
+    if end_idx == -1:
+        # For last category, find the final summary
+        end_idx = content.find('// Summary', start_idx)
+        if end_idx == -1:
+            end_idx = content.find('runTests()', start_idx)
+
+    # Extract section
+    section = content[start_idx:end_idx]
 
     # Write to file
     filename = f"tests/admin/{category_name}.test.ts"
-    with open(filename, 'w') as f:
-        f.write(test_file)
+    with open(filename, 'wb') as f:
+        f.write(HEADER_BYTES)
+        f.write(TITLE_TEMPLATE.format(category_name.upper()).encode('utf-8'))
+        f.write(section.encode('utf-8'))
+        f.write(FOOTER_BYTES)
 
     print(f"  ✅ Created {filename}")
 